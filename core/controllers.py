@@ -1,13 +1,408 @@
-from pynput import mouse, keyboard
 import threading
-import openai
 import os
 import inspect
 import time
 import queue
-import speech_recognition as sr
-import tempfile
-openai.api_key = os.getenv("OPENAI_API_KEY")
+import collections
+import functools
+import operator
+import hashlib
+import json
+import shelve
+import linecache
+import string
+import math
+import re
+import io
+import sys
+import uuid
+import types
+import ast
+import builtins
+import atexit
+import importlib.util
+
+# pynput, openai, speech_recognition and numpy are slow to import, so they are bound on first use
+mouse = keyboard = openai = sr = np = None
+
+# string forms of pynput buttons and special keys, so listeners do not build a new string per event
+_BUTTON_STR = {}
+_KEY_STR = {}
+
+
+def _import_pynput():
+    global mouse, keyboard
+    if mouse is None:
+        from pynput import mouse, keyboard
+        _BUTTON_STR.update((button, sys.intern(str(button))) for button in mouse.Button)
+        _KEY_STR.update((key, sys.intern(str(key))) for key in keyboard.Key)
+
+
+def _import_openai():
+    global openai
+    if openai is None:
+        import openai
+
+
+@functools.lru_cache(maxsize=1)
+def _get_client():
+    """
+    Returns the process-wide OpenAI client, so every scheme and interface shares one keep-alive
+    connection pool (multiplexed over HTTP/2 when the h2 package is installed).
+    """
+    _import_openai()
+    import httpx
+    http_client = openai.DefaultHttpxClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(max_keepalive_connections=4)
+    )
+    client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
+    atexit.register(client.close)
+    return client
+
+
+def _import_speech_recognition():
+    global sr
+    if sr is None:
+        import speech_recognition as sr
+
+
+def _import_numpy():
+    global np
+    if np is None:
+        import numpy as np
+
+POLICY_CACHE_PATH = os.path.expanduser("~/.marionette_cache")
+POLICY_CACHE_SIZE = 256
+EMBEDDING_MODEL = "text-embedding-3-small"
+SIMILARITY_THRESHOLD = 0.92
+EVENT_LOG_SIZE = 8192
+POLICY_CODE_CACHE_SIZE = 128
+CALLBACK_TOP_K = 5
+CALLBACK_FILTER_MIN = 8
+MIC_PROFILE_PATH = os.path.expanduser("~/.marionette_mic_profile.json")
+MIC_PROFILE_MAX_AGE = 3600
+LOCAL_WHISPER_MODEL = "small"
+
+
+_STOP_WORDS = frozenset(
+    "a an and are as at be by do for from i if in into is it me my of on or the then this to until when with".split()
+)
+
+
+def _terms(text):
+    words = re.findall(r"[a-z0-9]+", (text or "").lower().replace("_", " "))
+    return collections.Counter(word for word in words if word not in _STOP_WORDS)
+
+
+def _unit_vector(embedding):
+    if np is None:
+        norm = math.sqrt(math.fsum(x * x for x in embedding)) or 1.0
+        return tuple(x / norm for x in embedding)
+    vector = np.array(embedding, dtype=np.float32)
+    vector /= np.linalg.norm(vector) or 1.0
+    return vector
+
+
+class PolicyCache(object):
+    """
+    Two-layer cache mapping policy requests to previously generated policy code.
+
+    - L1: exact match on a request key.
+    - L2: semantic match on the prompt embedding, restricted to entries generated under the same scope
+      (model, system prompt and registered callbacks).
+
+    Both layers share one LRU of at most `maxsize` entries, mirrored to an on-disk shelve; an evicted
+    entry is removed from memory and disk alike. Similarities are computed with numpy when it is
+    installed, and in pure Python otherwise.
+
+    Args:
+        path (str): Location of the on-disk shelve.
+        maxsize (int): Number of entries kept in memory and on disk.
+    """
+    def __init__(self, path=POLICY_CACHE_PATH, maxsize=POLICY_CACHE_SIZE):
+        try:
+            _import_numpy()
+        except ImportError:
+            pass
+        self.path = path
+        self.maxsize = maxsize
+        # key -> (scope, unit embedding, code), least recently used first
+        self._entries = collections.OrderedDict()
+        # scope -> (embedding matrix, keys), built on the first lookup after the scope changes
+        self._scopes = {}
+        self._lock = threading.Lock()
+        try:
+            with shelve.open(self.path) as db:
+                entries = sorted(((key, db[key]) for key in db), key=lambda item: item[1].get('ts', 0))
+                stale = max(0, len(entries) - maxsize)
+                for key, _ in entries[:stale]:
+                    del db[key]
+                for key, entry in entries[stale:]:
+                    self._entries[key] = (entry['scope'], _unit_vector(entry['embedding']), entry['code'])
+        except Exception as e:
+            print(f"Policy cache unavailable: {e}")
+
+    def get(self, key):
+        """
+        Returns the code stored under an exact request key, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def get_similar(self, scope, embedding, threshold=SIMILARITY_THRESHOLD):
+        """
+        Returns the code of the most similar prompt within a scope if its cosine similarity
+        reaches the threshold, otherwise None.
+        """
+        with self._lock:
+            if scope not in self._scopes:
+                keys = [key for key, entry in self._entries.items() if entry[0] == scope]
+                if not keys:
+                    return None
+                vectors = [self._entries[key][1] for key in keys]
+                self._scopes[scope] = (np.stack(vectors) if np is not None else vectors, keys)
+            matrix, keys = self._scopes[scope]
+            query = _unit_vector(embedding)
+            if np is not None:
+                similarities = np.dot(matrix, query)
+                best = int(np.argmax(similarities))
+            else:
+                similarities = [math.fsum(map(operator.mul, vector, query)) for vector in matrix]
+                best = max(range(len(keys)), key=similarities.__getitem__)
+            if similarities[best] < threshold:
+                return None
+            self._entries.move_to_end(keys[best])
+            return self._entries[keys[best]][2]
+
+    def put(self, key, scope, embedding, code):
+        """
+        Stores generated code under both the exact key and the prompt embedding, evicting the least
+        recently used entries beyond `maxsize`.
+        """
+        with self._lock:
+            self._entries[key] = (scope, _unit_vector(embedding), code)
+            self._entries.move_to_end(key)
+            self._scopes.pop(scope, None)
+            evicted = []
+            while len(self._entries) > self.maxsize:
+                old_key, (old_scope, _, _) = self._entries.popitem(last=False)
+                self._scopes.pop(old_scope, None)
+                evicted.append(old_key)
+            try:
+                with shelve.open(self.path) as db:
+                    db[key] = {'scope': scope, 'embedding': list(embedding), 'code': code, 'ts': time.time()}
+                    for old_key in evicted:
+                        db.pop(old_key, None)
+            except Exception as e:
+                print(f"Policy cache write failed: {e}")
+
+    def discard(self, code):
+        """
+        Removes every entry holding `code`, e.g. once it no longer loads as a policy.
+        """
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry[2] == code]
+            for key in keys:
+                self._scopes.pop(self._entries.pop(key)[0], None)
+            try:
+                with shelve.open(self.path) as db:
+                    for key in keys:
+                        db.pop(key, None)
+            except Exception as e:
+                print(f"Policy cache write failed: {e}")
+
+
+def _digest(**fields):
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+
+def _loadable(scheme, code):
+    """
+    Returns cached code if it still validates and compiles as a policy; otherwise evicts it and returns None.
+    """
+    if code is None:
+        return None
+    try:
+        scheme._compile_policy(code)
+    except Exception as e:
+        print(f"Discarding cached policy: {e}")
+        scheme.policy_cache.discard(code)
+        return None
+    return code
+
+
+def cached_policy_code(func):
+    """
+    Decorates a ControlScheme completion method so deterministic requests are served from
+    the scheme's PolicyCache. Requests with temperature > 0 always reach the API. Cached code
+    is passed to `on_chunk` in one piece.
+
+    Only code that validates and compiles as a policy is stored, and cached code that no longer does
+    (e.g. after the validator was tightened) is evicted and regenerated. Checking never executes the code.
+    """
+    @functools.wraps(func)
+    def wrapper(self, prompt, messages, model, temperature=0, on_chunk=None):
+        if temperature > 0:
+            return func(self, prompt, messages, model, temperature, on_chunk)
+        callbacks = self._callback_info
+        key = _digest(m=model, msgs=messages, cbs=callbacks)
+        generated_code = _loadable(self, self.policy_cache.get(key))
+        if generated_code is None:
+            scope = _digest(m=model, msgs=messages[:-1], cbs=callbacks)
+            try:
+                embedding = self.client.embeddings.create(model=EMBEDDING_MODEL, input=prompt).data[0].embedding
+            except Exception as e:
+                # the cache is an optimisation; without an embedding, generate without caching
+                print(f"Policy cache skipped, embedding failed: {e}")
+                embedding = None
+            if embedding is not None:
+                generated_code = _loadable(self, self.policy_cache.get_similar(scope, embedding))
+            if generated_code is None:
+                generated_code = func(self, prompt, messages, model, temperature, on_chunk)
+                if generated_code == 'None' or embedding is None:
+                    return generated_code
+                # raises before anything is stored if the code does not parse or validate; it is only
+                # executed once, by generate_policy_code, which then finds it in the code cache
+                self._compile_policy(generated_code)
+                self.policy_cache.put(key, scope, embedding, generated_code)
+                return generated_code
+            self.policy_cache.put(key, scope, embedding, generated_code)
+        if on_chunk is not None:
+            on_chunk(generated_code)
+        return generated_code
+    return wrapper
+
+
+class EventLog(object):
+    """
+    Bounded, append-only log of UI events shared by every policy of a ControlScheme.
+
+    - Producers publish each event once, however many policies are listening.
+    - Each policy reads through its own EventCursor, so a slow policy never holds up the others.
+    - Once full the oldest events are discarded; cursors that fall behind skip ahead.
+    - Reads of already published events take no lock; only waiting for new events does.
+
+    Args:
+        maxlen (int): Number of events retained.
+    """
+    def __init__(self, maxlen=EVENT_LOG_SIZE):
+        self._events = collections.deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self.count = 0
+
+    def append(self, event):
+        with self._cond:
+            self._events.append((self.count, event))
+            self.count += 1
+            self._cond.notify_all()
+
+    def read(self, index, timeout=None, local=()):
+        """
+        Returns the first retained event at or after `index` together with the index following it.
+        If the collection `local` becomes non-empty first, returns `(None, index)` instead.
+
+        Raises:
+            queue.Empty: If neither happens within `timeout` seconds.
+        """
+        if index < self.count:
+            # entries carry their sequence number, so an append racing this read is detected and
+            # falls through to the locked path instead of returning the wrong event
+            try:
+                index = max(index, self._events[0][0])
+                seq, event = self._events[index - self._events[0][0]]
+                if seq == index:
+                    return event, index + 1
+            except IndexError:
+                pass
+        with self._cond:
+            if not self._cond.wait_for(lambda: index < self.count or local, timeout):
+                raise queue.Empty
+            if index >= self.count:
+                return None, index
+            first = self._events[0][0]
+            index = max(index, first)
+            return self._events[index - first][1], index + 1
+
+    def cursor(self):
+        return EventCursor(self)
+
+
+class EventCursor(object):
+    """
+    A policy's read position in an EventLog, exposing the queue.Queue methods generated policies use.
+    Only events published after the cursor was created are returned.
+
+    Items passed to `put` are private to this cursor, as they were with a per-policy queue.Queue: they
+    are returned after the events published before them and are never seen by other policies.
+
+    `clear` may be called from any thread without locking: it only publishes a new clear mark, which
+    the reading thread applies at its next `get`.
+    """
+    def __init__(self, log):
+        self._log = log
+        self._index = log.count
+        # (log position at put, item)
+        self._local = collections.deque()
+        # (generation, log position at clear), rebound by clear and applied by the reading thread
+        self._cleared = self._applied = (0, self._index)
+
+    def put(self, item):
+        with self._log._cond:
+            self._local.append((self._log.count, item))
+            self._log._cond.notify_all()
+
+    def _pending(self):
+        # read position and local items as they will be once an outstanding clear is applied
+        cleared = self._cleared
+        if cleared is self._applied:
+            return self._index, self._local
+        return max(self._index, cleared[1]), ()
+
+    def get(self, block=True, timeout=None):
+        deadline = None if not block or timeout is None else time.monotonic() + timeout
+        while True:
+            cleared = self._cleared
+            if cleared is not self._applied:
+                self._applied = cleared
+                self._index = max(self._index, cleared[1])
+                self._local.clear()
+            if self._local and self._local[0][0] <= self._index:
+                return self._local.popleft()[1]
+            remaining = 0 if not block else None if deadline is None else max(0, deadline - time.monotonic())
+            event, index = self._log.read(self._index, remaining, self._local)
+            if self._cleared is not cleared and index <= self._cleared[1]:
+                # cleared while reading, and what was read predates the clear
+                continue
+            if index == self._index:
+                # woken by a put from another thread
+                return self._local.popleft()[1]
+            self._index = index
+            return event
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def empty(self):
+        index, local = self._pending()
+        return not local and index >= self._log.count
+
+    def qsize(self):
+        index, local = self._pending()
+        return max(0, min(self._log.count - index, len(self._log._events))) + len(local)
+
+    def clear(self):
+        """
+        Skips every event published so far and drops items put on this cursor. Constant time and
+        lock-free: a new clear mark is rebound in a single assignment, and the reading thread jumps to
+        it at its next `get`, so a read in progress on another thread is never disturbed.
+        """
+        generation, _ = self._cleared
+        self._cleared = (generation + 1, self._log.count)
 
 
 class ControlScheme(object):
@@ -17,38 +412,68 @@ class ControlScheme(object):
     - Converts UI input into a unified, timestamped event stream.
     - Interrupts active control policies upon each new event.
     - Dynamically generates or updates state machine code in response to prompts.
+
+    Args:
+        event_log_size (int): Number of recent events kept for policies to read. Memory stays bounded
+            under sustained input; a policy that falls more than this many events behind skips the oldest.
     """
-    def __init__(self):
-        self.control_policies = []
-        self.callbacks = {}
+    _code_cache = collections.OrderedDict()
+    _code_cache_lock = threading.Lock()
+
+    def __init__(self, event_log_size=EVENT_LOG_SIZE):
+        # copy-on-write tuple: rebound under _policies_lock, read without locking
+        self.control_policies = ()
+        self._reset_callbacks()
+        self.event_log = EventLog(event_log_size)
+        # bound once so publishing does not re-resolve the log
+        self._publish = self.event_log.append
+        self._policies_lock = threading.Lock()
+        _import_pynput()
         self.mouse_listener = mouse.Listener(on_click=self.on_click)
         self.keyboard_listener = keyboard.Listener(on_press=self.on_key_press)
-        self.client = openai.OpenAI(api_key=openai.api_key)
+        self.client = _get_client()
+        self.policy_cache = PolicyCache()
+        # routes this session's requests to the same OpenAI prompt-cache shard
+        self.session_id = uuid.uuid4().hex
+        self._stats = {'prompt_tokens': 0, 'cached_tokens': 0, 'completion_tokens': 0}
+        self._stats_lock = threading.Lock()
+        # listener callbacks only enqueue; the dispatcher thread publishes. Until the first policy is
+        # installed nothing can read events, so they are discarded and no thread runs
+        self._event_q = queue.SimpleQueue()
+        self._enqueue = lambda item: None
         # self.mouse_listener.start()
         # self.keyboard_listener.start()
 
+    def _reset_callbacks(self):
+        """
+        Empties the callback registry and the listing and ranking state derived from it.
+        """
+        self.callbacks = {}
+        self._flat_callbacks = {}
+        # read-only live view handed to policies, so none can rebind a callback for the others
+        self._policy_callbacks = types.MappingProxyType(self._flat_callbacks)
+        self._callback_lines = {}
+        self._callback_info = ""
+        self._callback_terms = {}
+        self._document_frequency = collections.Counter()
+
+    def _dispatch_loop(self):
+        while True:
+            self._publish(self._event_q.get())
+
     def on_click(self, x, y, button, pressed):
         event = {
             'type': 'on_click',
             'action': 'press' if pressed else 'release',
-            'button': str(button),
+            'button': _BUTTON_STR.get(button) or str(button),
             'position': (x, y)
         }
-        for control_policy in self.control_policies:
-            control_policy.event_queue.put(event)
+        self._enqueue(event)
 
     def on_key_press(self, key):
-        try:
-            key_str = key.char
-        except AttributeError:
-            key_str = str(key)
-        event = {
-            'type': 'on_key_press',
-            'action': 'press',
-            'key': key_str
-        }
-        for control_policy in self.control_policies:
-            control_policy.event_queue.put(event)
+        # character keys already carry their string; only Key members (hashed cheaply) go through the table
+        key_str = getattr(key, 'char', None) or _KEY_STR.get(key) or str(key)
+        self._enqueue({'type': 'on_key_press', 'action': 'press', 'key': key_str})
 
 
     def register_callback(self, callback):
@@ -59,8 +484,43 @@ class ControlScheme(object):
             callback (function): The function to register.
         """
         self.callbacks[callback.__name__] = {'function': callback, 'doc': callback.__doc__}
+        self._flat_callbacks[callback.__name__] = callback
+        # the listing is sorted so it does not depend on registration order
+        self._callback_lines[callback.__name__] = f"- {callback.__name__}: {callback.__doc__ or 'No docstring'}"
+        self._callback_info = "\n".join(line for _, line in sorted(self._callback_lines.items()))
+        terms = _terms(f"{callback.__name__} {callback.__doc__ or ''}")
+        self._document_frequency.subtract(self._callback_terms.get(callback.__name__, {}).keys())
+        self._document_frequency.update(terms.keys())
+        self._callback_terms[callback.__name__] = terms
 
-    def generate_policy_code(self, prompt, model="gpt-4o"):
+    def relevant_callbacks(self, prompt, k=CALLBACK_TOP_K):
+        """
+        Ranks registered callbacks by TF-IDF cosine similarity between their name and docstring and the prompt.
+
+        Args:
+            prompt (str): A text prompt describing the desired behavior.
+            k (int): Maximum number of callbacks to return.
+
+        Returns:
+            list: Names of up to `k` callbacks in registration order, or every callback name when
+            at most CALLBACK_FILTER_MIN are registered or none share a term with the prompt.
+        """
+        if len(self.callbacks) <= CALLBACK_FILTER_MIN:
+            return list(self.callbacks)
+        n = len(self._callback_terms)
+        idf = {term: math.log((1 + n) / (1 + df)) + 1 for term, df in self._document_frequency.items() if df > 0}
+        query = {term: tf * idf[term] for term, tf in _terms(prompt).items() if term in idf}
+        scores = {}
+        for name, terms in self._callback_terms.items():
+            overlap = sum(weight * terms[term] * idf[term] for term, weight in query.items() if term in terms)
+            if overlap:
+                scores[name] = overlap / math.sqrt(sum((tf * idf[term]) ** 2 for term, tf in terms.items()))
+        if not scores:
+            return list(self.callbacks)
+        top = set(sorted(scores, key=scores.get, reverse=True)[:k])
+        return [name for name in self.callbacks if name in top]
+
+    def generate_policy_code(self, prompt, model="gpt-4o", temperature=0, full_source=False, on_chunk=None):
         """
         Uses the ChatGPT API to generate code for the ControlPolicy.process method
         using the registered callback functions.
@@ -68,6 +528,9 @@ class ControlScheme(object):
         Args:
             prompt (str): A text prompt describing the desired behavior.
             model (str): OpenAI model to use (default: "gpt-5").
+            temperature (float): Sampling temperature; cached responses are only used at 0.
+            full_source (bool): Send the full ControlPolicy source instead of its compact schema.
+            on_chunk (function): Called with each piece of generated code as it streams in.
 
         Returns:
             str: The generated Python code as a string.
@@ -76,68 +539,149 @@ class ControlScheme(object):
             raise ValueError("No callbacks registered to include in policy generation.")
 
         # get info
-        callback_names = self.callbacks.keys()
-        callback_info = "\n".join(f"- {name}: {self.callbacks[cb]['doc']}"
-                                  for cb, name in zip(self.callbacks.keys(), callback_names))
-        control_policy_source = inspect.getsource(ControlPolicy)
-
-        # generate prompts
-        system_prompt = (
-            "You are a coding assistant that generates Python code for control policies.\n"
-            "Given a set of available callback functions and a behavioral prompt, generate a Python class "
-            "that derives from the provided `ControlPolicy` base class.\n"
-            "- Only trigger on keyboard / mouse events if explicitly instructed to do so in prompt, otherwise just invoke callbacks directly.\n"
-            "- You MUST define the class as a subclass of ControlPolicy using: `class DerivedControlPolicy(ControlPolicy):`\n"            
-            "- Output must be raw code only — DO NOT include any quotes, triple quotes, or markdown-style code blocks like ```python.\n"
-            "- Include all required imports inline.\n"
-            "- When timing is required, implement a `process` method using time.sleep-based delays.\n"
-            "- For every callback used, add a print at the beginning with format: "
-            "f'func_name(keyword=value)'\n"
-            "- Add print statements for every event received on event_queue with format: "
-            "f'{event dictionary}'\n"
-            "- Do not add any additional print statements besides the ones described.\n\n"
-            "- Use only the available callbacks passed into the constructor.\n\n"
-            "- Only generate code if there is a high degree of confidence, otherwise return the message 'None'"
-            "For reference: "
-            f"- ControlPolicy base class: {control_policy_source}\n\n"
-            "- Mouse event format: {'type': 'on_click', 'action': 'press' or 'release', 'button': '<Button.left>', 'position': (x, y)}\n\n"
-            "- Keyboard event format: {'type': 'on_key_press', 'action': 'press', 'key': '<character or special key>'}\n\n"
-        )
-        user_prompt = (
-            f"The following callbacks are available:\n{callback_info}\n\n"
-            f"Write a ControlPolicy.process method that behaves as described:\n{prompt}"
-        )
+        names = self.relevant_callbacks(prompt)
+        if len(names) < len(self.callbacks):
+            callback_info = "\n".join(self._callback_lines[name] for name in sorted(names))
+        else:
+            callback_info = self._callback_info
+
+        # generate prompts; static prefix first so OpenAI prompt caching can reuse it, then the
+        # callbacks, then the prompt
+        messages = [
+            {"role": "system", "content": _full_source_prefix() if full_source else STATIC_PREFIX},
+            {"role": "user", "content": _REQUEST_TEMPLATE.format_map({"callbacks": callback_info, "prompt": prompt})}
+        ]
 
         # generate code
-        response = self.client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0
-        )
-        generated_code = response.choices[0].message.content
+        generated_code = self._complete_policy_code(prompt, messages, model, temperature, on_chunk)
         # print(generated_code)
 
         # exec code
         if generated_code != 'None':
-            local_ns = {}
-            exec(generated_code, {**globals(), "ControlPolicy": ControlPolicy}, local_ns)
-            policy_instance = local_ns["DerivedControlPolicy"](self.callbacks)
+            policy_class = self._policy_class(generated_code)
+            policy_instance = policy_class.__new__(policy_class)
+            policy_instance.event_queue = self.event_log.cursor()
+            policy_instance.__init__(self._policy_callbacks)
             return policy_instance
         else:
             return None
 
+    def _compile_policy(self, generated_code):
+        """
+        Validates and compiles generated policy source without running it. Compiled code is kept in a
+        bounded LRU keyed by a digest of the source, so repeated policies skip parsing, validation and
+        compilation.
+
+        Returns:
+            tuple: The code object and the filename it was compiled under.
+
+        Raises:
+            ValueError: If the source is rejected by PolicyValidator.
+        """
+        digest = hashlib.blake2b(generated_code.encode()).hexdigest()
+        filename = f"<policy:{digest[:8]}>"
+        with self._code_cache_lock:
+            code = self._code_cache.get(digest)
+            if code is not None:
+                self._code_cache.move_to_end(digest)
+                return code, filename
+        tree = ast.parse(generated_code, filename, "exec")
+        PolicyValidator().visit(tree)
+        tree = ast.fix_missing_locations(_OwnObjectGuard().visit(tree))
+        code = compile(tree, filename, "exec")
+        # register the source so tracebacks from policy threads show the offending lines
+        linecache.cache[filename] = (len(generated_code), None, generated_code.splitlines(True), filename)
+        with self._code_cache_lock:
+            self._code_cache[digest] = code
+            while len(self._code_cache) > POLICY_CODE_CACHE_SIZE:
+                _, evicted = self._code_cache.popitem(last=False)
+                # drop the source with its code, so linecache does not grow with every distinct policy
+                linecache.cache.pop(evicted.co_filename, None)
+        return code, filename
+
+    def _policy_class(self, generated_code):
+        """
+        Executes compiled policy source in a fresh, restricted namespace and returns the
+        DerivedControlPolicy class it defines, so policies never share module globals or class attributes.
+        """
+        code, filename = self._compile_policy(generated_code)
+        # a single namespace, like a module, so top-level imports are visible inside methods
+        namespace = {
+            "__builtins__": _POLICY_BUILTINS,
+            "__name__": filename,
+            "__policy_self__": _own_object_check(filename),
+            "ControlPolicy": ControlPolicy,
+            "time": time,
+            "queue": queue,
+        }
+        exec(code, namespace)
+        return namespace["DerivedControlPolicy"]
+
+    @cached_policy_code
+    def _complete_policy_code(self, prompt, messages, model, temperature=0, on_chunk=None):
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+            prompt_cache_key=self.session_id
+        )
+        # drain the stream fully so the connection goes back to the pool
+        buffer = io.StringIO()
+        for chunk in stream:
+            content = chunk.choices[0].delta.content if chunk.choices else None
+            if content:
+                buffer.write(content)
+                if on_chunk is not None:
+                    on_chunk(content)
+            if chunk.usage is not None:
+                self._record_usage(chunk.usage)
+        return buffer.getvalue()
+
+    def _record_usage(self, usage):
+        cached = getattr(usage.prompt_tokens_details, 'cached_tokens', 0) or 0
+        with self._stats_lock:
+            self._stats['prompt_tokens'] += usage.prompt_tokens
+            self._stats['cached_tokens'] += cached
+            self._stats['completion_tokens'] += usage.completion_tokens
+        print(f"Tokens: {usage.prompt_tokens} prompt ({cached} cached), {usage.completion_tokens} completion")
+
+    @property
+    def cache_hit_rate(self):
+        """
+        Fraction of prompt tokens served from OpenAI's prompt cache so far.
+        """
+        with self._stats_lock:
+            return self._stats['cached_tokens'] / self._stats['prompt_tokens'] if self._stats['prompt_tokens'] else 0.0
+
+    async def generate_policy_code_async(self, prompt, **kwargs):
+        """
+        Awaitable generate_policy_code for event-loop callers such as the Textual UI. Generation runs
+        on a worker thread, so the loop stays responsive and several prompts can be in flight at once.
+        """
+        # only event-loop callers need asyncio, and importing it is a large share of import time
+        import asyncio
+        return await asyncio.to_thread(self.generate_policy_code, prompt, **kwargs)
+
+    def install_policy(self, policy):
+        """
+        Registers a generated policy, discarding events still pending for the existing ones.
+        """
+        with self._policies_lock:
+            for control_policy in self.control_policies:
+                control_policy.event_queue.clear()
+            self.control_policies = self.control_policies + (policy,)
+            if len(self.control_policies) == 1:
+                threading.Thread(target=self._dispatch_loop, daemon=True).start()
+                self._enqueue = self._event_q.put_nowait
+
     def add_policy(self, user_prompt, daemon=False):
         try:
             try:
                 policy = self.generate_policy_code(user_prompt)
                 if policy:
-                    for control_policy in self.control_policies:
-                        with control_policy.event_queue.mutex:
-                            control_policy.event_queue.queue.clear()
-                    self.control_policies.append(policy)
+                    self.install_policy(policy)
                     if daemon:
                         control_thread = threading.Thread(target=policy.process, daemon=True)
                         control_thread.start()
@@ -148,6 +692,21 @@ class ControlScheme(object):
         except KeyboardInterrupt:
             print("Shutting down ControlScheme.")
 
+    def submit_policy(self, user_prompt):
+        """
+        Generates and runs a policy on a background thread so callers can keep accepting prompts
+        while earlier requests are still in flight.
+
+        Args:
+            user_prompt (str): A text prompt describing the desired behavior.
+
+        Returns:
+            threading.Thread: The thread generating and running the policy.
+        """
+        policy_thread = threading.Thread(target=self.add_policy, args=(user_prompt,), daemon=True)
+        policy_thread.start()
+        return policy_thread
+
 
 
 
@@ -160,41 +719,433 @@ class ControlPolicy(object):
     - Subclasses override the `process` method to define asynchronous control behavior.
 
     Args:acacac
-        callbacks (dict): A dictionary of callback functions and their associated metadata.
+        callbacks (Mapping): A read-only mapping of callback names to callback functions, shared with the ControlScheme.
     """
+    # the ControlScheme attaches a cursor on its EventLog before __init__ runs, so subclasses can
+    # already use it in their own __init__
+    event_queue = None
+
     def __init__(self, callbacks):
-        self.callbacks = {key: value['function'] for key, value in callbacks.items()}
-        self.event_queue = queue.Queue()
+        self.callbacks = callbacks
         self.start_time = time.time()
 
     def process(self):
         pass
 
 
-class SpeechInterface(object):
+# functools is left out: update_wrapper / wraps copy attributes named by strings the validator never sees
+_POLICY_IMPORTS = frozenset({"time", "math", "random", "queue", "threading", "collections", "itertools"})
+_POLICY_BUILTINS = {
+    name: getattr(builtins, name) for name in (
+        "abs", "all", "any", "bool", "callable", "chr", "classmethod", "dict", "divmod", "enumerate", "filter",
+        "float", "frozenset", "hasattr", "int", "isinstance", "iter", "len", "list", "map", "max", "min", "next",
+        "object", "ord", "print", "property", "range", "repr", "reversed", "round", "set", "sorted", "staticmethod",
+        "str", "sum", "super", "tuple", "type", "zip", "AttributeError", "BaseException", "Exception", "IndexError",
+        "KeyError", "KeyboardInterrupt", "NotImplementedError", "RuntimeError", "StopIteration", "TypeError",
+        "ValueError", "ZeroDivisionError", "__build_class__",
+    )
+}
+
+
+# Static system prompt, rendered once at import. OpenAI only caches exact prefixes of at least
+# 1024 tokens, so nothing dynamic may be interpolated here; the worked examples keep it above that size.
+_SYSTEM_TEMPLATE = string.Template(
+    "You are a coding assistant that generates Python code for control policies.\n"
+    "Given a set of available callback functions and a behavioral prompt, generate a Python class "
+    "that derives from the provided `ControlPolicy` base class.\n"
+    "- Only trigger on keyboard / mouse events if explicitly instructed to do so in prompt, otherwise just invoke callbacks directly.\n"
+    "- You MUST define the class as a subclass of ControlPolicy using: `class DerivedControlPolicy(ControlPolicy):`\n"
+    "- Output must be raw code only — DO NOT include any quotes, triple quotes, or markdown-style code blocks like ```python.\n"
+    "- Include all required imports inline. Only these modules may be imported: $imports.\n"
+    "- Only these builtins are available: $builtins.\n"
+    "- Do not use dunder attributes other than `__init__`, or underscore attributes of anything but `self` "
+    "inside methods whose first parameter is `self`. Never assign to `self`.\n"
+    "- Use f-strings for formatting; str.format is only allowed on literal strings with plain fields.\n"
+    "- Do not inspect frames, tracebacks, generators or code objects (e.g. gi_frame, f_back, tb_frame, co_code).\n"
+    "- When timing is required, implement a `process` method using time.sleep-based delays.\n"
+    "- For every callback used, add a print at the beginning with format: "
+    "f'func_name(keyword=value)'\n"
+    "- Add print statements for every event received on event_queue with format: "
+    "f'{event dictionary}'\n"
+    "- Do not add any additional print statements besides the ones described.\n\n"
+    "- Use only the available callbacks passed into the constructor.\n\n"
+    "- Only generate code if there is a high degree of confidence, otherwise return the message 'None'\n"
+    "For reference: "
+    "- ControlPolicy base class: $cp_source\n\n"
+    "- Mouse event format: {'type': 'on_click', 'action': 'press' or 'release', 'button': '<Button.left>', 'position': (x, y)}\n\n"
+    "- Keyboard event format: {'type': 'on_key_press', 'action': 'press', 'key': '<character or special key>'}\n\n"
+    "Example 1. Callbacks:\n"
+    "- move_forward: Moves the robot forward by `distance` meters.\n"
+    "- turn: Turns the robot by `angle` degrees.\n"
+    "Prompt: drive a square with one meter sides, pausing half a second at each corner.\n"
+    "Response:\n"
+    "import time\n"
+    "class DerivedControlPolicy(ControlPolicy):\n"
+    "    def process(self):\n"
+    "        for _ in range(4):\n"
+    "            print(f'move_forward(distance=1.0)')\n"
+    "            self.callbacks['move_forward'](distance=1.0)\n"
+    "            time.sleep(0.5)\n"
+    "            print(f'turn(angle=90)')\n"
+    "            self.callbacks['turn'](angle=90)\n\n"
+    "Example 2. Callbacks:\n"
+    "- set_speed: Sets the motor speed to `value`, between 0.0 and 1.0.\n"
+    "Prompt: when I press the up arrow speed up by a tenth, when I press the down arrow slow down by a tenth, "
+    "and stop completely on a left click.\n"
+    "Response:\n"
+    "class DerivedControlPolicy(ControlPolicy):\n"
+    "    def process(self):\n"
+    "        speed = 0.0\n"
+    "        while True:\n"
+    "            event = self.event_queue.get()\n"
+    "            print(f'{event}')\n"
+    "            if event['type'] == 'on_key_press' and event['key'] in ('Key.up', 'Key.down'):\n"
+    "                step = 0.1 if event['key'] == 'Key.up' else -0.1\n"
+    "                speed = min(1.0, max(0.0, speed + step))\n"
+    "            elif event['type'] == 'on_click' and event['action'] == 'press' and event['button'] == 'Button.left':\n"
+    "                speed = 0.0\n"
+    "            else:\n"
+    "                continue\n"
+    "            print(f'set_speed(value={speed})')\n"
+    "            self.callbacks['set_speed'](value=speed)\n\n"
+    "Example 3. Callbacks:\n"
+    "- speak: Says `text` aloud through the robot's speaker.\n"
+    "Prompt: for the next ten seconds, whenever I type a letter say it out loud.\n"
+    "Response:\n"
+    "import queue\n"
+    "import time\n"
+    "class DerivedControlPolicy(ControlPolicy):\n"
+    "    def process(self):\n"
+    "        while time.time() - self.start_time < 10.0:\n"
+    "            try:\n"
+    "                event = self.event_queue.get(timeout=10.0 - (time.time() - self.start_time))\n"
+    "            except (queue.Empty, ValueError):\n"
+    "                break\n"
+    "            print(f'{event}')\n"
+    "            if event['type'] == 'on_key_press' and len(event['key']) == 1 and event['key'].isalpha():\n"
+    "                print(f\"speak(text={event['key']!r})\")\n"
+    "                self.callbacks['speak'](text=event['key'])\n\n"
+    "Example 4. Callbacks:\n"
+    "- set_speed: Sets the motor speed to `value`, between 0.0 and 1.0.\n"
+    "Prompt: make me a sandwich.\n"
+    "Response:\n"
+    "None\n"
+)
+# The model only needs the interface of ControlPolicy, not its source and docstring.
+_CP_SCHEMA = (
+    "class ControlPolicy:\n"
+    "    def __init__(self, callbacks: dict[str, Callable]): ...\n"
+    "    def process(self): ...\n"
+    "    # self.callbacks: read-only mapping of callback name to function\n"
+    "    # self.event_queue: queue.Queue-like; get(block=True, timeout=None) returns the next event, "
+    "raising queue.Empty on timeout\n"
+    "    # self.start_time: float (time.time() at init)\n"
+)
+_SANDBOX = {
+    "imports": ", ".join(sorted(_POLICY_IMPORTS)),
+    "builtins": ", ".join(sorted(name for name in _POLICY_BUILTINS if not name.startswith("_"))),
+}
+STATIC_PREFIX = _SYSTEM_TEMPLATE.substitute(cp_source=_CP_SCHEMA, **_SANDBOX)
+# roughly 4 characters per token: below this the prefix would miss OpenAI's 1024-token cache minimum
+assert len(STATIC_PREFIX) > 4096, "STATIC_PREFIX is too short to be prompt-cached"
+
+
+@functools.lru_cache(maxsize=1)
+def _full_source_prefix():
+    """
+    Returns the system prompt with the full ControlPolicy source. Built on first use, as reading the
+    source dominates import time and only `full_source=True` requests need it.
+    """
+    try:
+        cp_source = inspect.getsource(ControlPolicy)
+    except OSError:
+        # source files are not shipped with frozen builds
+        cp_source = ControlPolicy.__doc__
+    return _SYSTEM_TEMPLATE.substitute(cp_source=cp_source, **_SANDBOX)
+
+
+# dynamic user message, sent after the static prefix; the prompt goes last as it varies the most
+_REQUEST_TEMPLATE = (
+    "The following callbacks are available:\n{callbacks}\n\n"
+    "Write a ControlPolicy.process method that behaves as described:\n{prompt}"
+)
+
+def _policy_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name.partition(".")[0] not in _POLICY_IMPORTS:
+        raise ImportError(f"Policies may not import {name}")
+    return builtins.__import__(name, globals, locals, fromlist, level)
+
+
+_POLICY_BUILTINS["__import__"] = _policy_import
+
+
+# prefixes of generator, coroutine, frame, traceback and code object attributes, through which a
+# policy could walk up to a frame whose globals hold real modules (e.g. `gen.gi_frame.f_back.f_globals`)
+_INTROSPECTION_PREFIXES = ("gi_", "cr_", "ag_", "f_", "tb_", "co_")
+
+
+def _plain_format(fmt):
+    # str.format resolves attribute and index fields itself, out of sight of the AST checks
+    try:
+        for _, field, spec, _ in string.Formatter().parse(fmt):
+            if field is not None and ("." in field or "[" in field):
+                return False
+            if spec and not _plain_format(spec):
+                return False
+    except ValueError:
+        return False
+    return True
+
+
+class PolicyValidator(ast.NodeVisitor):
+    """
+    Rejects generated policy code that could reach module internals outside its namespace:
+
+    - imports of modules outside _POLICY_IMPORTS;
+    - dunder attributes other than `self.__init__` and `super().__init__`;
+    - underscore attributes of anything but `self` inside a method whose first parameter is `self`
+      (e.g. `random._os`), including `from random import _os`;
+    - any other binding of `self`: assignment, loop, `with`, walrus, `except`, import or match targets,
+      `global` / `nonlocal` declarations, and parameters other than a method's first;
+    - other bindings of names starting with `__`, which are reserved for the sandbox;
+    - frame, traceback, generator and code object attributes (see _INTROSPECTION_PREFIXES);
+    - subscripts, dict literal keys and keyword arguments with underscore names (e.g. `f_globals['_os']`,
+      `type('B', (), {'__globals__': g})`);
+    - `format` / `format_map` except on string literals without attribute or index fields.
 
+    The checks are best-effort: they close the escapes known so far, but Python offers no airtight
+    sandbox, so policies should still only be generated from trusted prompts.
+
+    Raises:
+        ValueError: On the first disallowed node.
+    """
     def __init__(self):
+        # per function scope: whether `self` is a method's first parameter (inherited by nested functions)
+        self._owns_self = [False]
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self._check_module(alias.name)
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node):
+        self._check_module(node.module or "", node.level)
+        for alias in node.names:
+            if alias.name.startswith("_"):
+                raise ValueError(f"Policies may not import {alias.name} (line {node.lineno})")
+        self.generic_visit(node)
+
+    def visit_alias(self, node):
+        self._check_binding(node.asname or node.name.partition(".")[0], node)
+
+    def visit_ClassDef(self, node):
+        self._check_binding(node.name, node)
+        for child in node.decorator_list + node.bases + node.keywords:
+            self.visit(child)
+        for statement in node.body:
+            if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self._visit_function(statement, method=True)
+            else:
+                self.visit(statement)
+
+    def visit_FunctionDef(self, node):
+        self._check_binding(node.name, node)
+        self._visit_function(node, method=False)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        self._visit_function(node, method=False)
+
+    def _visit_function(self, node, method):
+        positional = node.args.posonlyargs + node.args.args
+        owns_self = method and bool(positional) and positional[0].arg == "self"
+        for arg in positional[owns_self:] + node.args.kwonlyargs + [node.args.vararg, node.args.kwarg]:
+            if arg is not None:
+                self._check_binding(arg.arg, node)
+        self._owns_self.append(owns_self or self._owns_self[-1])
+        self.generic_visit(node)
+        self._owns_self.pop()
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            self._check_binding(node.name, node)
+        self.generic_visit(node)
+
+    def visit_Global(self, node):
+        for name in node.names:
+            self._check_binding(name, node)
+
+    visit_Nonlocal = visit_Global
+
+    def visit_MatchAs(self, node):
+        if node.name:
+            self._check_binding(node.name, node)
+        self.generic_visit(node)
+
+    visit_MatchStar = visit_MatchAs
+
+    def visit_MatchMapping(self, node):
+        if node.rest:
+            self._check_binding(node.rest, node)
+        self.generic_visit(node)
+
+    def visit_Attribute(self, node):
+        if node.attr == "__init__" and _is_self_or_super(node.value):
+            pass
+        elif node.attr.startswith("__") and node.attr.endswith("__"):
+            raise ValueError(f"Policies may not access {node.attr} (line {node.lineno})")
+        elif node.attr.startswith("_") and not (
+                self._owns_self[-1] and isinstance(node.value, ast.Name) and node.value.id == "self"):
+            raise ValueError(f"Policies may only access underscore attributes of self in methods (line {node.lineno})")
+        elif node.attr.startswith(_INTROSPECTION_PREFIXES):
+            raise ValueError(f"Policies may not access {node.attr} (line {node.lineno})")
+        elif node.attr in ("format", "format_map") and not (
+                isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+                and _plain_format(node.value.value)):
+            raise ValueError(f"Policies may only call {node.attr} on plain string literals (line {node.lineno})")
+        self.generic_visit(node)
+
+    def visit_Subscript(self, node):
+        if isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str) and node.slice.value.startswith("_"):
+            raise ValueError(f"Policies may not subscript with {node.slice.value!r} (line {node.lineno})")
+        self.generic_visit(node)
+
+    def visit_Dict(self, node):
+        for key in node.keys:
+            if isinstance(key, ast.Constant) and isinstance(key.value, str) and key.value.startswith("_"):
+                raise ValueError(f"Policies may not use {key.value!r} as a dict key (line {node.lineno})")
+        self.generic_visit(node)
+
+    def visit_keyword(self, node):
+        if node.arg and node.arg.startswith("_"):
+            raise ValueError(f"Policies may not pass keyword {node.arg} (line {getattr(node, 'lineno', '?')})")
+        self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if node.id.startswith("__"):
+            raise ValueError(f"Policies may not reference {node.id} (line {node.lineno})")
+        if not isinstance(node.ctx, ast.Load):
+            self._check_binding(node.id, node)
+
+    def _check_binding(self, name, node):
+        if name == "self" or name.startswith("__"):
+            raise ValueError(f"Policies may not bind {name} (line {getattr(node, 'lineno', '?')})")
+
+    def _check_module(self, name, level=0):
+        if level or name.partition(".")[0] not in _POLICY_IMPORTS:
+            raise ValueError(f"Policies may not import {name or '.'}")
+
+
+def _is_self_or_super(node):
+    # `self.__init__` or `super().__init__`, the only objects whose __init__ a policy may reach
+    if isinstance(node, ast.Name):
+        return node.id == "self"
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "super"
+
+
+class _OwnObjectGuard(ast.NodeTransformer):
+    """
+    Routes every `self._x` through `__policy_self__(self)`, so a method called unbound with a foreign
+    object as `self` (e.g. `DerivedControlPolicy.process(random)`) cannot reach its internals.
+    """
+    def visit_Attribute(self, node):
+        self.generic_visit(node)
+        if isinstance(node.value, ast.Name) and node.value.id == "self" and node.attr.startswith("_") \
+                and node.attr != "__init__":
+            guard = ast.Call(ast.Name("__policy_self__", ast.Load()), [node.value], [])
+            node.value = ast.copy_location(guard, node.value)
+        return node
+
+
+def _own_object_check(filename):
+    def check(obj):
+        if type(obj).__module__ != filename:
+            raise AttributeError("Policies may only access underscore attributes of their own objects")
+        return obj
+    return check
+
+
+class SpeechInterface(object):
+
+    def __init__(self, download_whisper=False):
+        _import_speech_recognition()
         self.recognizer = sr.Recognizer()
         self.control_scheme = ControlScheme()
-        self.client = openai.OpenAI(api_key=openai.api_key)
+        self.client = _get_client()
+        self.calibrated = self.load_mic_profile()
+        self.whisper = self.load_local_whisper(download=download_whisper)
+
+    def load_local_whisper(self, model=LOCAL_WHISPER_MODEL, download=False):
+        """
+        Loads an int8 faster-whisper model so utterances are translated locally.
+
+        Args:
+            model (str): Model size or path.
+            download (bool): Fetch the model from the Hugging Face hub if it is not cached locally.
+
+        Returns:
+            WhisperModel: The local model, or None to fall back to OpenAI's whisper-1.
+        """
+        try:
+            from faster_whisper import WhisperModel
+            return WhisperModel(model, device="cpu", compute_type="int8", local_files_only=not download)
+        except Exception as e:
+            print(f"Local Whisper unavailable, using whisper-1: {e}")
+            return None
+
+    def translate(self, wav_bytes):
+        """
+        Translates a WAV utterance into English text.
+        """
+        if self.whisper is not None:
+            segments, _ = self.whisper.transcribe(io.BytesIO(wav_bytes), task="translate", beam_size=1, vad_filter=True)
+            return " ".join(segment.text.strip() for segment in segments)
+        transcript = self.client.audio.translations.create(model="whisper-1", file=("audio.wav", wav_bytes))
+        return transcript.text or ""
+
+    def load_mic_profile(self, path=MIC_PROFILE_PATH):
+        """
+        Restores the energy threshold saved by a recent calibration.
+
+        Returns:
+            bool: True if a profile younger than MIC_PROFILE_MAX_AGE was applied.
+        """
+        try:
+            with open(path) as f:
+                profile = json.load(f)
+            if time.time() - profile.get("ts", 0) > MIC_PROFILE_MAX_AGE:
+                return False
+            threshold = float(profile["threshold"])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            # missing, unreadable or malformed profiles just mean recalibrating
+            return False
+        self.recognizer.energy_threshold = threshold
+        self.recognizer.dynamic_energy_threshold = True
+        return True
+
+    def save_mic_profile(self, path=MIC_PROFILE_PATH):
+        try:
+            with open(path, "w") as f:
+                json.dump({"threshold": self.recognizer.energy_threshold, "ts": time.time()}, f)
+        except OSError as e:
+            print(f"Could not save microphone profile: {e}")
 
     def start(self):
         with sr.Microphone() as source:
-            self.recognizer.adjust_for_ambient_noise(source, duration=1.0)
+            if not self.calibrated:
+                self.recognizer.adjust_for_ambient_noise(source, duration=1.0)
+                self.save_mic_profile()
+                self.calibrated = True
             print("🎙️ Listening... (Ctrl+C to stop)")
             while True:
                 try:
                     audio_data = self.recognizer.listen(source)
                     wav_bytes = audio_data.get_wav_data()
-                    with tempfile.NamedTemporaryFile(suffix=".wav") as tf:
-                        tf.write(wav_bytes)
-                        tf.flush()
-                        with open(tf.name, "rb") as f:
-                            transcript = self.client.audio.translations.create(model="whisper-1", file=f)
-                    prompt = (transcript.text or "").strip()
+                    prompt = self.translate(wav_bytes).strip()
                     if prompt:
                         print("You said:", prompt)
-                        self.control_scheme.add_policy(prompt)
+                        self.control_scheme.submit_policy(prompt)
                 except sr.WaitTimeoutError:
                     continue
                 except KeyboardInterrupt:
@@ -213,6 +1164,8 @@ class TextInterface(object):
 
     def start(self):
         print("⌨️  Type prompts. Press Enter on an empty line to quit. (Ctrl+C to stop)")
+        # input() keeps readline line editing and history; policies are generated on background
+        # threads, so the prompt is free again as soon as a line is submitted
         while True:
             try:
                 prompt = input("> ").strip()
@@ -220,8 +1173,8 @@ class TextInterface(object):
                     print("Exiting TextInterface.")
                     break
                 print("You typed:", prompt)
-                self.control_scheme.add_policy(prompt)
-            except KeyboardInterrupt:
+                self.control_scheme.submit_policy(prompt)
+            except (KeyboardInterrupt, EOFError):
                 print("Stopping TextInterface.")
                 break
             except Exception as e:
@@ -1,14 +1,28 @@
 
 
+import asyncio
+import threading
+
 from textual.app import App, ComposeResult
 from textual.containers import Container, Horizontal, Vertical
 from textual.widgets import Header, Footer, Tree, Static, Input, TextLog
 from textual.reactive import reactive
 from textual import events
 
+if __package__:
+    from .controllers import ControlScheme
+else:
+    # run as a script from inside core/
+    from controllers import ControlScheme
+
 class ControlPolicyUI(App):
     CSS_PATH = "panels.css"
 
+    def __init__(self, control_scheme=None, **kwargs):
+        super().__init__(**kwargs)
+        self.control_scheme = control_scheme or ControlScheme()
+        self._tasks = set()
+
     def compose(self) -> ComposeResult:
         yield Header()
         yield Container(
@@ -26,12 +40,45 @@ class ControlPolicyUI(App):
     def on_mount(self):
         self.query_one("#messages", TextLog).write("System ready. Awaiting policy input...")
 
-    def on_input_submitted(self, message: Input.Submitted):
+    async def on_input_submitted(self, message: Input.Submitted):
         prompt = message.value.strip()
         self.query_one("#messages", TextLog).write(f">>> {prompt}")
         self.query_one("#input", Input).value = ""
-        # Placeholder: dispatch prompt to backend
-        # self.dispatch_prompt(prompt)
+        if prompt:
+            task = asyncio.create_task(self.dispatch_prompt(prompt))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def dispatch_prompt(self, prompt):
+        """
+        Generates a policy for the prompt, streaming its code into the message log line by line,
+        then starts it on a daemon thread.
+        """
+        log = self.query_one("#messages", TextLog)
+        pending = []
+
+        def on_chunk(chunk):
+            # called on the generation thread
+            pending.append(chunk)
+            if "\n" in chunk:
+                *lines, rest = "".join(pending).split("\n")
+                pending[:] = [rest]
+                for line in lines:
+                    self.call_from_thread(log.write, line)
+
+        try:
+            policy = await self.control_scheme.generate_policy_code_async(prompt, on_chunk=on_chunk)
+        except Exception as e:
+            log.write(f"Error generating policy: {e}")
+            return
+        if "".join(pending):
+            log.write("".join(pending))
+        if policy is None:
+            log.write("No policy generated.")
+            return
+        self.control_scheme.install_policy(policy)
+        self.query_one("#tree", Tree).root.add_leaf(prompt)
+        threading.Thread(target=policy.process, daemon=True).start()
 
     def on_tree_node_selected(self, event: Tree.NodeSelected):
         node = event.node
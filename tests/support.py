@@ -0,0 +1,11 @@
+from core.controllers import ControlScheme
+
+
+def bare_scheme():
+    """
+    Returns a ControlScheme with an empty callback registry but no listeners, event log, OpenAI client
+    or policy cache, which pynput and openai would be needed for. Tests attach whatever else they use.
+    """
+    scheme = ControlScheme.__new__(ControlScheme)
+    scheme._reset_callbacks()
+    return scheme
@@ -0,0 +1,174 @@
+import collections
+import queue
+import threading
+import time
+import unittest
+
+from core.controllers import EventLog
+
+
+class EventLogTest(unittest.TestCase):
+
+    def test_publish_order(self):
+        log = EventLog()
+        cursor = log.cursor()
+        for i in range(5):
+            log.append(i)
+        self.assertEqual(cursor.qsize(), 5)
+        self.assertEqual([cursor.get() for _ in range(5)], [0, 1, 2, 3, 4])
+        self.assertTrue(cursor.empty())
+
+    def test_cursor_sees_only_later_events(self):
+        log = EventLog()
+        log.append('before')
+        cursor = log.cursor()
+        log.append('after')
+        self.assertEqual(cursor.get_nowait(), 'after')
+        self.assertTrue(cursor.empty())
+
+    def test_cursors_are_independent(self):
+        log = EventLog()
+        first, second = log.cursor(), log.cursor()
+        log.append('a')
+        log.append('b')
+        self.assertEqual(first.get(), 'a')
+        self.assertEqual(second.get(), 'a')
+        self.assertEqual(second.get(), 'b')
+        self.assertEqual(first.get(), 'b')
+
+    def test_put_is_private_and_ordered(self):
+        log = EventLog()
+        cursor, other = log.cursor(), log.cursor()
+        log.append('e1')
+        cursor.put('local')
+        log.append('e2')
+        self.assertEqual(cursor.qsize(), 3)
+        self.assertEqual([cursor.get_nowait() for _ in range(3)], ['e1', 'local', 'e2'])
+        self.assertEqual([other.get_nowait() for _ in range(2)], ['e1', 'e2'])
+        self.assertTrue(other.empty())
+
+    def test_put_wakes_blocked_get(self):
+        log = EventLog()
+        cursor = log.cursor()
+        timer = threading.Timer(0.05, cursor.put, args=('signal',))
+        timer.start()
+        self.assertEqual(cursor.get(timeout=5), 'signal')
+        timer.join()
+
+    def test_append_wakes_blocked_get(self):
+        log = EventLog()
+        cursor = log.cursor()
+        timer = threading.Timer(0.05, log.append, args=('event',))
+        timer.start()
+        self.assertEqual(cursor.get(timeout=5), 'event')
+        timer.join()
+
+    def test_clear(self):
+        log = EventLog()
+        cursor = log.cursor()
+        log.append('stale')
+        cursor.put('stale local')
+        cursor.clear()
+        self.assertTrue(cursor.empty())
+        self.assertEqual(cursor.qsize(), 0)
+        log.append('fresh')
+        self.assertEqual(cursor.get_nowait(), 'fresh')
+
+    def test_clear_during_read(self):
+        log = EventLog()
+        cursor = log.cursor()
+        log.append('stale')
+        read = log.read
+
+        def racing_read(*args):
+            # another thread clears the cursor after the read has found the stale event
+            log.read = read
+            result = read(*args)
+            cursor.clear()
+            log.append('fresh')
+            return result
+        log.read = racing_read
+        self.assertEqual(cursor.get_nowait(), 'fresh')
+        self.assertTrue(cursor.empty())
+
+    def test_clear_while_blocked(self):
+        log = EventLog()
+        cursor = log.cursor()
+        cursor.put('stale local')
+        cursor.clear()
+
+        def publish():
+            log.append('fresh')
+        timer = threading.Timer(0.05, publish)
+        timer.start()
+        self.assertEqual(cursor.get(timeout=5), 'fresh')
+        timer.join()
+
+    def test_overflow_skips_ahead(self):
+        log = EventLog(maxlen=4)
+        cursor = log.cursor()
+        for i in range(10):
+            log.append(i)
+        self.assertEqual(cursor.qsize(), 4)
+        self.assertEqual([cursor.get_nowait() for _ in range(4)], [6, 7, 8, 9])
+        self.assertTrue(cursor.empty())
+
+    def test_empty_raises(self):
+        cursor = EventLog().cursor()
+        with self.assertRaises(queue.Empty):
+            cursor.get_nowait()
+        with self.assertRaises(queue.Empty):
+            cursor.get(block=False)
+        start = time.monotonic()
+        with self.assertRaises(queue.Empty):
+            cursor.get(timeout=0.05)
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+    def test_read_detects_racing_append(self):
+        log = EventLog(maxlen=2)
+        cursor = log.cursor()
+        log.append('a')
+        log.append('b')
+
+        class RacingDeque(collections.deque):
+            # publishes once between the lock-free read's lookup of the oldest entry and its indexing
+            race = True
+
+            def __getitem__(self, i):
+                item = super().__getitem__(i)
+                if self.race:
+                    self.race = False
+                    log.append('late')
+                return item
+
+        log._events = RacingDeque(log._events, maxlen=2)
+        self.assertEqual(cursor.get_nowait(), 'b')
+        self.assertEqual(cursor.get_nowait(), 'late')
+
+    def test_concurrent_reads_during_appends(self):
+        # readers race the producer through the lock-free path while the log wraps around, so each
+        # must still see strictly increasing events and, once caught up, the last one
+        log = EventLog(maxlen=16)
+        total = 20000
+        results = []
+
+        def read(cursor):
+            seen = []
+            while not seen or seen[-1] != total - 1:
+                seen.append(cursor.get(timeout=5))
+            results.append(seen)
+
+        readers = [threading.Thread(target=read, args=(log.cursor(),)) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        for i in range(total):
+            log.append(i)
+        for reader in readers:
+            reader.join()
+        self.assertEqual(len(results), 4)
+        for seen in results:
+            self.assertTrue(all(a < b for a, b in zip(seen, seen[1:])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import os
+import shelve
+import tempfile
+import types
+import unittest
+
+from core.controllers import PolicyCache, cached_policy_code
+from tests.support import bare_scheme
+
+
+CODE = (
+    "class DerivedControlPolicy(ControlPolicy):\n"
+    "    def process(self):\n"
+    "        pass\n"
+)
+
+# prompt -> embedding; "stop now" is close to "stop", "jump" is orthogonal to both
+EMBEDDINGS = {
+    "stop": [1.0, 0.0, 0.0],
+    "stop now": [0.99, 0.05, 0.0],
+    "jump": [0.0, 1.0, 0.0],
+}
+
+
+class StubEmbeddings(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    def create(self, model, input):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("offline")
+        return types.SimpleNamespace(data=[types.SimpleNamespace(embedding=EMBEDDINGS[input])])
+
+
+class TempCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.path = os.path.join(self._tmp.name, "cache")
+
+    def shelved_keys(self):
+        with shelve.open(self.path) as db:
+            return set(db)
+
+
+class PolicyCacheTest(TempCacheTest):
+
+    def test_exact_match(self):
+        cache = PolicyCache(self.path)
+        self.assertIsNone(cache.get("k"))
+        cache.put("k", "scope", EMBEDDINGS["stop"], "code")
+        self.assertEqual(cache.get("k"), "code")
+
+    def test_lru_eviction_reaches_disk(self):
+        cache = PolicyCache(self.path, maxsize=2)
+        cache.put("a", "scope", EMBEDDINGS["stop"], "code a")
+        cache.put("b", "scope", EMBEDDINGS["jump"], "code b")
+        cache.get("a")
+        cache.put("c", "scope", EMBEDDINGS["stop now"], "code c")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(self.shelved_keys(), {"a", "c"})
+        reloaded = PolicyCache(self.path, maxsize=2)
+        self.assertEqual(reloaded.get("a"), "code a")
+        self.assertEqual(reloaded.get("c"), "code c")
+
+    def test_shelve_trimmed_to_maxsize_on_load(self):
+        cache = PolicyCache(self.path, maxsize=3)
+        for key in ("a", "b", "c"):
+            cache.put(key, "scope", EMBEDDINGS["stop"], f"code {key}")
+        trimmed = PolicyCache(self.path, maxsize=2)
+        self.assertIsNone(trimmed.get("a"))
+        self.assertEqual(trimmed.get("c"), "code c")
+        self.assertEqual(self.shelved_keys(), {"b", "c"})
+
+    def test_similar_within_scope(self):
+        cache = PolicyCache(self.path)
+        cache.put("k", "scope", EMBEDDINGS["stop"], "code")
+        self.assertEqual(cache.get_similar("scope", EMBEDDINGS["stop now"]), "code")
+        self.assertIsNone(cache.get_similar("scope", EMBEDDINGS["jump"]))
+        self.assertIsNone(cache.get_similar("other scope", EMBEDDINGS["stop"]))
+
+    def test_put_invalidates_scope(self):
+        cache = PolicyCache(self.path)
+        cache.put("stop", "scope", EMBEDDINGS["stop"], "stop code")
+        self.assertIsNone(cache.get_similar("scope", EMBEDDINGS["jump"]))
+        cache.put("jump", "scope", EMBEDDINGS["jump"], "jump code")
+        self.assertEqual(cache.get_similar("scope", EMBEDDINGS["jump"]), "jump code")
+
+    def test_discard(self):
+        cache = PolicyCache(self.path)
+        cache.put("a", "scope", EMBEDDINGS["stop"], "bad")
+        cache.put("b", "scope", EMBEDDINGS["stop now"], "bad")
+        cache.put("c", "scope", EMBEDDINGS["jump"], "good")
+        self.assertEqual(cache.get_similar("scope", EMBEDDINGS["stop"]), "bad")
+        cache.discard("bad")
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNone(cache.get_similar("scope", EMBEDDINGS["stop"]))
+        self.assertEqual(self.shelved_keys(), {"c"})
+
+
+class CachedPolicyCodeTest(TempCacheTest):
+
+    def setUp(self):
+        super().setUp()
+        self.scheme = bare_scheme()
+        self.scheme._callback_info = "- stop: Stops."
+        self.scheme.policy_cache = PolicyCache(self.path)
+        self.scheme.client = types.SimpleNamespace(embeddings=StubEmbeddings())
+        self.responses = {}
+        self.generated = []
+
+        @cached_policy_code
+        def complete(scheme, prompt, messages, model, temperature=0, on_chunk=None):
+            self.generated.append(prompt)
+            return self.responses.get(prompt, CODE)
+        self.complete = complete
+
+    def request(self, prompt, temperature=0, on_chunk=None):
+        messages = [{"role": "system", "content": "system"}, {"role": "user", "content": prompt}]
+        return self.complete(self.scheme, prompt, messages, "model", temperature, on_chunk)
+
+    def test_cache_never_executes_code(self):
+        # generate_policy_code executes the returned code itself, so checking it must not run it again
+        def execute(code):
+            raise AssertionError("cached_policy_code executed policy code")
+        self.scheme._policy_class = execute
+        self.request("stop")
+        self.request("stop")
+        self.request("stop now")
+        self.assertEqual(self.generated, ["stop"])
+
+    def test_exact_and_similar_hits(self):
+        chunks = []
+        self.assertEqual(self.request("stop"), CODE)
+        self.assertEqual(self.request("stop", on_chunk=chunks.append), CODE)
+        self.assertEqual(self.request("stop now"), CODE)
+        self.assertEqual(self.generated, ["stop"])
+        self.assertEqual(chunks, [CODE])
+
+    def test_temperature_bypasses_cache(self):
+        self.request("stop", temperature=0.5)
+        self.request("stop", temperature=0.5)
+        self.assertEqual(self.generated, ["stop", "stop"])
+        self.assertEqual(self.scheme.client.embeddings.calls, 0)
+
+    def test_embedding_failure_generates_without_caching(self):
+        self.scheme.client.embeddings.fail = True
+        self.assertEqual(self.request("stop"), CODE)
+        self.scheme.client.embeddings.fail = False
+        self.request("stop")
+        self.assertEqual(self.generated, ["stop", "stop"])
+
+    def test_none_and_invalid_code_not_cached(self):
+        self.responses = {"stop": "None", "jump": "import os\n"}
+        self.assertEqual(self.request("stop"), "None")
+        with self.assertRaises(ValueError):
+            self.request("jump")
+        self.assertEqual(self.shelved_keys(), set())
+
+    def test_stale_cached_code_regenerated(self):
+        self.request("stop")
+        self.scheme.policy_cache.put("stale", "scope", EMBEDDINGS["jump"], "import os\n")
+        for key in self.shelved_keys():
+            self.scheme.policy_cache.put(key, "scope", EMBEDDINGS["stop"], "import os\n")
+        self.assertEqual(self.request("stop"), CODE)
+        self.assertEqual(self.generated, ["stop", "stop"])
+        self.assertNotIn("stale", self.shelved_keys())
+
+
+if __name__ == "__main__":
+    unittest.main()
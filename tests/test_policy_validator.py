@@ -0,0 +1,230 @@
+import linecache
+import unittest
+from unittest import mock
+
+from core import controllers
+from core.controllers import EventLog
+from tests.support import bare_scheme
+
+
+def load(code):
+    return bare_scheme()._policy_class(code)
+
+
+def run(code, **callbacks):
+    policy_class = load(code)
+    policy = policy_class.__new__(policy_class)
+    policy.event_queue = EventLog().cursor()
+    policy.__init__(callbacks)
+    policy.process()
+
+
+class AcceptTest(unittest.TestCase):
+
+    def test_imports_and_private_state(self):
+        calls = []
+        run(
+            "import time, random\n"
+            "from collections import deque\n"
+            "class DerivedControlPolicy(ControlPolicy):\n"
+            "    def __init__(self, callbacks):\n"
+            "        super().__init__(callbacks)\n"
+            "        self._count = 2\n"
+            "        self.__history = deque()\n"
+            "    def process(self):\n"
+            "        self.__history.append(random.random())\n"
+            "        self.callbacks['beep'](n=self._count + len(self.__history))\n",
+            beep=lambda n: calls.append(n),
+        )
+        self.assertEqual(calls, [3])
+
+    def test_common_builtins(self):
+        calls = []
+        run(
+            "class DerivedControlPolicy(ControlPolicy):\n"
+            "    @staticmethod\n"
+            "    def half(x):\n"
+            "        return divmod(x, 2)[0]\n"
+            "    @property\n"
+            "    def letters(self):\n"
+            "        return iter('ab')\n"
+            "    def process(self):\n"
+            "        try:\n"
+            "            None.missing\n"
+            "        except AttributeError:\n"
+            "            pass\n"
+            "        try:\n"
+            "            1 / 0\n"
+            "        except ZeroDivisionError:\n"
+            "            pass\n"
+            "        letter = next(self.letters)\n"
+            "        if callable(self.callbacks['beep']) and hasattr(self, 'callbacks') and type(letter) is str:\n"
+            "            self.callbacks['beep'](n=self.half(ord(letter)), key=chr(ord(letter) + 1))\n",
+            beep=lambda n, key: calls.append((n, key)),
+        )
+        self.assertEqual(calls, [(48, 'b')])
+
+    def test_private_state_in_nested_function(self):
+        calls = []
+        run(
+            "class DerivedControlPolicy(ControlPolicy):\n"
+            "    def process(self):\n"
+            "        self._label = '{} {:>3}'.format('n', 7)\n"
+            "        def report():\n"
+            "            self.callbacks['beep'](label=self._label)\n"
+            "        report()\n",
+            beep=lambda label: calls.append(label),
+        )
+        self.assertEqual(calls, ['n   7'])
+
+    def test_event_queue(self):
+        run(
+            "import queue\n"
+            "class DerivedControlPolicy(ControlPolicy):\n"
+            "    def process(self):\n"
+            "        try:\n"
+            "            self.event_queue.get(timeout=0.01)\n"
+            "        except queue.Empty:\n"
+            "            pass\n"
+        )
+
+    def test_repeated_code_gets_fresh_namespace(self):
+        code = (
+            "hits = []\n"
+            "class DerivedControlPolicy(ControlPolicy):\n"
+            "    def process(self):\n"
+            "        hits.append(1)\n"
+            "        self.callbacks['count'](n=len(hits))\n"
+        )
+        counts = []
+        run(code, count=lambda n: counts.append(n))
+        run(code, count=lambda n: counts.append(n))
+        self.assertEqual(counts, [1, 1])
+        self.assertIsNot(load(code), load(code))
+
+    def test_evicted_code_leaves_linecache(self):
+        codes = [f"x = {i}\nclass DerivedControlPolicy(ControlPolicy):\n    pass\n" for i in range(3)]
+        with mock.patch.object(controllers, "POLICY_CODE_CACHE_SIZE", 2):
+            filenames = [load(code).__module__ for code in codes]
+        self.assertNotIn(filenames[0], linecache.cache)
+        self.assertIn(filenames[2], linecache.cache)
+
+
+class RejectTest(unittest.TestCase):
+
+    def assertRejected(self, code):
+        with self.assertRaises(ValueError):
+            load(code)
+
+    def test_imports(self):
+        self.assertRejected("import os")
+        self.assertRejected("import os.path")
+        self.assertRejected("from . import controllers")
+        self.assertRejected("from random import _os")
+        self.assertRejected("__import__('os')")
+
+    def test_dunder_and_private_attributes(self):
+        self.assertRejected("x = ().__class__")
+        self.assertRejected("import random\nrandom._os.system('true')")
+        self.assertRejected(
+            "class DerivedControlPolicy(ControlPolicy):\n"
+            "    def process(self):\n"
+            "        return self.callbacks.__class__\n"
+        )
+        self.assertRejected(
+            "class DerivedControlPolicy(ControlPolicy):\n"
+            "    def process(self):\n"
+            "        return self.event_queue.__log\n"
+        )
+
+    def test_attribute_copy_escape(self):
+        self.assertRejected(
+            "import functools\n"
+            "g = {}\n"
+            "functools.update_wrapper(type('B', (), {'__globals__': g})(), ControlPolicy.__init__,\n"
+            "                         assigned=(), updated=('__globals__',))\n"
+            "OS = g['os']\n"
+        )
+        self.assertRejected("import functools")
+        self.assertRejected("f = ControlPolicy.__init__")
+        self.assertRejected("import random\nf = random.Random.__init__")
+        self.assertRejected("B = type('B', (), {'__globals__': {}})")
+        self.assertRejected("B = type('B', (), dict(__globals__={}))")
+
+    def test_frame_escape(self):
+        self.assertRejected(
+            "class DerivedControlPolicy(ControlPolicy):\n"
+            "    def process(self):\n"
+            "        def gen():\n"
+            "            yield g.gi_frame.f_back.f_back\n"
+            "        g = gen()\n"
+            "        next(g).f_globals['_os'].system('true')\n"
+        )
+        self.assertRejected("def f():\n    pass\ncode = f.co_code")
+        self.assertRejected("namespace = {}\nmodule = namespace['_os']")
+
+    def test_rebinding_self(self):
+        for code in [
+            "import random\nself = random\nOS = self._os",
+            "import random\nfor self in [random]:\n    pass",
+            "import threading\nwith threading.Lock() as self:\n    pass",
+            "import random\nif (self := random):\n    pass",
+            "def f():\n    global self\n",
+            "def f():\n    self = 1\n    def g():\n        nonlocal self\n",
+            "try:\n    pass\nexcept Exception as self:\n    pass",
+            "import random as self",
+            "get = lambda self: self",
+            "def f(self):\n    return self",
+            "class DerivedControlPolicy(ControlPolicy):\n    def process(other, self):\n        pass\n",
+            "class DerivedControlPolicy(ControlPolicy):\n    def process(self):\n        self = None\n",
+        ]:
+            with self.subTest(code=code):
+                self.assertRejected(code)
+
+    def test_private_attributes_outside_methods(self):
+        self.assertRejected("def f(self):\n    return self._os")
+        self.assertRejected(
+            "class DerivedControlPolicy(ControlPolicy):\n"
+            "    @staticmethod\n"
+            "    def helper(obj):\n"
+            "        return obj._os\n"
+        )
+
+    def test_unbound_call_with_foreign_self(self):
+        policy_class = load(
+            "import random\n"
+            "class DerivedControlPolicy(ControlPolicy):\n"
+            "    def leak(self):\n"
+            "        return self._os\n"
+            "    def process(self):\n"
+            "        return DerivedControlPolicy.leak(random)\n"
+        )
+        with self.assertRaises(AttributeError):
+            policy_class({}).process()
+
+    def test_format_fields(self):
+        self.assertRejected(
+            "class DerivedControlPolicy(ControlPolicy):\n"
+            "    def process(self):\n"
+            "        return '{0.__init__.__globals__[os].environ[HOME]}'.format(self)\n"
+        )
+        self.assertRejected("text = '{0.callbacks}'.format(x)")
+        self.assertRejected("text = '{0[key]}'.format(x)")
+        self.assertRejected("text = '{0:{1.fill}}'.format(x, y)")
+        self.assertRejected("text = '{a.b}'.format_map(x)")
+        self.assertRejected("template = '{}'\ntext = template.format(x)")
+        self.assertRejected("text = str.format('{0.x}', x)")
+
+    def test_missing_builtins(self):
+        with self.assertRaises(NameError):
+            run(
+                "class DerivedControlPolicy(ControlPolicy):\n"
+                "    def process(self):\n"
+                "        open('/etc/passwd')\n"
+            )
+        with self.assertRaises(NameError):
+            load("getattr(object, 'x')")
+
+
+if __name__ == "__main__":
+    unittest.main()
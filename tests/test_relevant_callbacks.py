@@ -0,0 +1,66 @@
+import unittest
+
+from core.controllers import CALLBACK_FILTER_MIN
+from tests.support import bare_scheme
+
+
+def callback(name, doc):
+    def function():
+        pass
+    function.__name__ = name
+    function.__doc__ = doc
+    return function
+
+
+CALLBACKS = [
+    ("move_forward", "Moves the robot forward by `distance` meters."),
+    ("turn", "Turns the robot by `angle` degrees."),
+    ("set_speed", "Sets the motor speed to `value`."),
+    ("speak", "Says `text` aloud through the speaker."),
+    ("beep", "Plays a short beep."),
+    ("open_gripper", "Opens the gripper."),
+    ("close_gripper", "Closes the gripper around an object."),
+    ("take_photo", "Captures a photo with the camera."),
+    ("blink_led", "Blinks the status light."),
+    ("dock", "Returns to the charging dock."),
+]
+
+
+def scheme(callbacks=CALLBACKS):
+    control_scheme = bare_scheme()
+    for name, doc in callbacks:
+        control_scheme.register_callback(callback(name, doc))
+    return control_scheme
+
+
+class RelevantCallbacksTest(unittest.TestCase):
+
+    def test_few_callbacks_all_returned(self):
+        few = scheme(CALLBACKS[:CALLBACK_FILTER_MIN])
+        self.assertEqual(few.relevant_callbacks("take a photo", k=1), [name for name, _ in CALLBACKS[:CALLBACK_FILTER_MIN]])
+
+    def test_top_k_in_registration_order(self):
+        control_scheme = scheme()
+        self.assertEqual(control_scheme.relevant_callbacks("close the gripper, then take a photo", k=2),
+                         ["close_gripper", "take_photo"])
+        names = control_scheme.relevant_callbacks("grab it with the gripper and speak", k=3)
+        self.assertEqual(names, ["speak", "open_gripper", "close_gripper"])
+
+    def test_no_overlap_returns_all(self):
+        control_scheme = scheme()
+        self.assertEqual(control_scheme.relevant_callbacks("make me a sandwich"), [name for name, _ in CALLBACKS])
+
+    def test_reregistered_docstring(self):
+        control_scheme = scheme()
+        self.assertEqual(control_scheme.relevant_callbacks("flash the light", k=1), ["blink_led"])
+        control_scheme.register_callback(callback("beep", "Flashes the light twice."))
+        control_scheme.register_callback(callback("blink_led", "Blinks the status lamp."))
+        self.assertEqual(control_scheme.relevant_callbacks("flash the light", k=1), ["beep"])
+        self.assertEqual(control_scheme.relevant_callbacks("short beep", k=2), ["beep"])
+        # terms of the old docstring no longer count towards document frequency
+        self.assertEqual(control_scheme._document_frequency["short"], 0)
+        self.assertEqual(control_scheme._document_frequency["gripper"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()